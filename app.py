@@ -4,17 +4,19 @@ import time
 import traceback
 from config import Config
 from quiz_solver import QuizSolver
+from shared_state import SharedState
+from logging_setup import setup_logging
 
 # Setup logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+setup_logging(Config)
 logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 app.config.from_object(Config)
 
+# Shared with every gunicorn worker so job status and stats are consistent
+shared_state = SharedState(Config)
+
 @app.route('/', methods=['GET'])
 def home():
     """Health check endpoint"""
@@ -24,6 +26,35 @@ def home():
         'version': '1.0.0'
     }), 200
 
+@app.route('/status/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """Look up a quiz job started by any worker"""
+    job = shared_state.get_job(job_id)
+    
+    if not job:
+        return jsonify({'error': 'Unknown job'}), 404
+    
+    return jsonify(job), 200
+
+@app.route('/status', methods=['GET'])
+def job_status_by_url():
+    """Look up the latest quiz job for ?url=, e.g. while its /quiz request is still running"""
+    url = request.args.get('url')
+    if not url:
+        return jsonify({'error': 'Missing url parameter'}), 400
+    
+    job = shared_state.find_job(url)
+    
+    if not job:
+        return jsonify({'error': 'Unknown job'}), 404
+    
+    return jsonify(job), 200
+
+@app.route('/stats', methods=['GET'])
+def stats():
+    """Cache and job counters aggregated across workers"""
+    return jsonify(shared_state.get_counters()), 200
+
 @app.route('/quiz', methods=['POST'])
 def quiz_endpoint():
     """Main quiz endpoint that receives and processes quiz tasks"""
@@ -57,11 +88,25 @@ def quiz_endpoint():
         
         logger.info(f'Received quiz request for URL: {data["url"]}')
         
-        # Initialize quiz solver
-        solver = QuizSolver(app.config)
+        # Claim the job before solving so duplicate requests on any worker see it
+        job_id, created = shared_state.claim_job(data['url'], Config.MAX_QUIZ_TIME, Config.JOB_STALE_AFTER)
+        if not created:
+            logger.info(f'Quiz already in progress as job {job_id}')
+            return jsonify({
+                'status': 'in_progress',
+                'message': 'Quiz is already being processed',
+                'job_id': job_id
+            }), 202
         
-        # Process the quiz
-        result = solver.solve_quiz_chain(data['url'], data['email'], data['secret'])
+        try:
+            # Initialize quiz solver
+            solver = QuizSolver(Config, shared_state)
+            
+            # Process the quiz
+            solver.solve_quiz_chain(data['url'], data['email'], data['secret'], job_id=job_id)
+        except Exception as e:
+            shared_state.update_job(job_id, 'failed', {'error': str(e)})
+            raise
         
         elapsed_time = time.time() - start_time
         logger.info(f'Quiz processing completed in {elapsed_time:.2f} seconds')
@@ -69,6 +114,7 @@ def quiz_endpoint():
         return jsonify({
             'status': 'success',
             'message': 'Quiz processing initiated',
+            'job_id': job_id,
             'elapsed_time': elapsed_time
         }), 200
         
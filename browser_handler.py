@@ -1,5 +1,8 @@
 import logging
 import time
+import atexit
+import threading
+from collections import deque
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
@@ -10,18 +13,62 @@ from webdriver_manager.chrome import ChromeDriverManager
 
 logger = logging.getLogger(__name__)
 
+# Resources that never affect body.text; blocked through CDP in lean mode
+BLOCKED_URL_PATTERNS = [
+    '*.png', '*.jpg', '*.jpeg', '*.gif', '*.webp', '*.svg', '*.ico', '*.bmp',
+    '*.woff', '*.woff2', '*.ttf', '*.otf', '*.eot',
+    '*.mp4', '*.webm', '*.mp3', '*.wav', '*.ogg'
+]
+
+# Stylesheets do affect body.text (elements they hide become visible), so they are blocked separately
+CSS_URL_PATTERNS = ['*.css']
+
+# Per-page stats kept for inspection; totals are kept separately for the worker's lifetime
+RECENT_PAGES = 50
+
+_browser = None
+_browser_lock = threading.Lock()
+
+def get_browser(config):
+    """Return this worker's warm browser, starting it on first use"""
+    global _browser
+    with _browser_lock:
+        if _browser is None:
+            _browser = BrowserHandler(config)
+            atexit.register(_browser.close)
+        return _browser
+
+# Bytes transferred for the document and its subresources, plus navigation timings in ms
+PAGE_METRICS_SCRIPT = """
+const nav = performance.getEntriesByType('navigation')[0];
+const resources = performance.getEntriesByType('resource');
+return {
+    bytes_transferred: (nav ? nav.transferSize : 0) + resources.reduce((total, r) => total + (r.transferSize || 0), 0),
+    resource_count: resources.length,
+    dom_content_loaded_ms: nav ? nav.domContentLoadedEventEnd : null
+};
+"""
+
 class BrowserHandler:
     """Handle browser automation using Selenium"""
     
     def __init__(self, config):
         self.config = config
         self.driver = None
+        self.tab_handle = None
+        self.page_totals = {'pages': 0, 'bytes_transferred': 0, 'render_time': 0.0,
+                            'dom_pages': 0, 'dom_content_loaded_ms': 0.0}
+        self.recent_pages = deque(maxlen=RECENT_PAGES)
+        self.stats_lock = threading.Lock()
+        # The driver is shared by every request this worker serves; load one page at a time
+        self.lock = threading.Lock()
         self._init_driver()
     
     def _init_driver(self):
         """Initialize Chrome WebDriver"""
         try:
             chrome_options = Options()
+            lean_mode = self.config.BROWSER_LEAN_MODE
             
             if self.config.HEADLESS_BROWSER:
                 chrome_options.add_argument('--headless')
@@ -29,24 +76,78 @@ class BrowserHandler:
             chrome_options.add_argument('--no-sandbox')
             chrome_options.add_argument('--disable-dev-shm-usage')
             chrome_options.add_argument('--disable-gpu')
-            chrome_options.add_argument('--window-size=1920,1080')
             chrome_options.add_argument('--user-agent=Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36')
             
+            if lean_mode:
+                chrome_options.add_argument('--window-size=1024,768')
+                chrome_options.add_argument('--blink-settings=imagesEnabled=false')
+                chrome_options.add_argument('--disable-extensions')
+                chrome_options.add_experimental_option('prefs', {
+                    'profile.managed_default_content_settings.images': 2,
+                    'profile.managed_default_content_settings.fonts': 2
+                })
+                # Return once the DOM is ready instead of waiting for every subresource
+                chrome_options.page_load_strategy = 'eager'
+            else:
+                chrome_options.add_argument('--window-size=1920,1080')
+            
             service = Service(ChromeDriverManager().install())
             self.driver = webdriver.Chrome(service=service, options=chrome_options)
             self.driver.set_page_load_timeout(self.config.BROWSER_TIMEOUT)
             
-            logger.info('Browser initialized successfully')
+            self.tab_handle = self.driver.current_window_handle
+            self._block_urls()
             
+            logger.info(f'Browser initialized successfully (lean mode: {lean_mode})')
+        
         except Exception as e:
             logger.error(f'Failed to initialize browser: {str(e)}')
             raise
     
+    def _block_urls(self):
+        """Block heavy resources in the current tab in lean mode
+        
+        CDP network settings belong to one tab, so this must run again
+        whenever the tab is replaced.
+        """
+        if not self.config.BROWSER_LEAN_MODE:
+            return
+        
+        self.driver.execute_cdp_cmd('Network.enable', {})
+        blocked_urls = BLOCKED_URL_PATTERNS + (CSS_URL_PATTERNS if self.config.BROWSER_BLOCK_CSS else [])
+        self.driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': blocked_urls})
+    
+    def _ensure_tab(self):
+        """Make sure the warm tab is usable, opening a new tab or restarting Chrome if not"""
+        try:
+            if self.driver.current_window_handle == self.tab_handle:
+                return
+            self.driver.switch_to.window(self.tab_handle)
+        except Exception:
+            logger.warning('Warm tab unavailable, opening a new one')
+            try:
+                self.driver.switch_to.new_window('tab')
+                self.tab_handle = self.driver.current_window_handle
+                self._block_urls()
+            except Exception:
+                logger.warning('Browser unresponsive, restarting it')
+                self.close()
+                self._init_driver()
+    
     def get_page_content(self, url):
         """Get rendered page content including JavaScript execution"""
+        with self.lock:
+            return self._load_page(url)
+    
+    def _load_page(self, url):
         try:
             logger.info(f'Loading page: {url}')
+            self._ensure_tab()
+            
+            # Time only the navigation, so lean and full loads are comparable
+            load_start = time.time()
             self.driver.get(url)
+            render_time = time.time() - load_start
             
             # Wait for page to load
             time.sleep(2)
@@ -56,20 +157,67 @@ class BrowserHandler:
                 EC.presence_of_element_located((By.TAG_NAME, 'body'))
             )
             
-            # Get the rendered HTML
+            # Get the rendered text
             content = self.driver.find_element(By.TAG_NAME, 'body').text
             
-            # Also get the full HTML if needed
-            html = self.driver.page_source
+            self._record_page_stats(url, render_time)
             
             logger.info(f'Page content retrieved: {len(content)} chars')
             
             return content
-            
+        
         except Exception as e:
             logger.error(f'Error getting page content: {str(e)}')
             return None
     
+    def _record_page_stats(self, url, render_time):
+        """Record bytes transferred and render time for the current page"""
+        try:
+            metrics = self.driver.execute_script(PAGE_METRICS_SCRIPT)
+        except Exception as e:
+            logger.warning(f'Could not read page metrics: {str(e)}')
+            metrics = {}
+        
+        stats = {
+            'url': url,
+            'render_time': render_time,
+            'bytes_transferred': metrics.get('bytes_transferred', 0),
+            'resource_count': metrics.get('resource_count', 0),
+            'dom_content_loaded_ms': metrics.get('dom_content_loaded_ms')
+        }
+        with self.stats_lock:
+            self.recent_pages.append(stats)
+            self.page_totals['pages'] += 1
+            self.page_totals['bytes_transferred'] += stats['bytes_transferred']
+            self.page_totals['render_time'] += render_time
+            if stats['dom_content_loaded_ms'] is not None:
+                self.page_totals['dom_pages'] += 1
+                self.page_totals['dom_content_loaded_ms'] += stats['dom_content_loaded_ms']
+        
+        logger.info(f'Page metrics: {stats["bytes_transferred"]} bytes, {stats["resource_count"]} resources, '
+                    f'loaded in {render_time:.2f}s')
+    
+    def snapshot_stats(self):
+        """Return a copy of the running page totals, to pass to get_stats later"""
+        with self.stats_lock:
+            return dict(self.page_totals)
+    
+    def get_stats(self, since=None):
+        """Return page load totals, optionally only since an earlier snapshot_stats()"""
+        totals = self.snapshot_stats()
+        if since:
+            totals = {name: value - since.get(name, 0) for name, value in totals.items()}
+        
+        pages = totals['pages']
+        dom_pages = totals['dom_pages']
+        return {
+            'lean_mode': self.config.BROWSER_LEAN_MODE,
+            'pages': pages,
+            'bytes_transferred': totals['bytes_transferred'],
+            'avg_render_time': totals['render_time'] / pages if pages else 0.0,
+            'avg_dom_content_loaded_ms': totals['dom_content_loaded_ms'] / dom_pages if dom_pages else None
+        }
+    
     def close(self):
         """Close the browser"""
         if self.driver:
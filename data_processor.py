@@ -1,29 +1,72 @@
 import logging
 import os
-import requests
 import pandas as pd
 import json
+import tempfile
 from pathlib import Path
 import PyPDF2
 from bs4 import BeautifulSoup
 import base64
+from file_cache import FileCache
+from shared_state import SharedState
+from http_client import get_http_client
+
+try:
+    from PIL import Image
+except ImportError:  # Optional: only needed to shrink oversized image answers
+    Image = None
 
 logger = logging.getLogger(__name__)
 
+# Read size for streaming base64; a multiple of 3 so chunks encode without padding
+BASE64_CHUNK_SIZE = 3 * 64 * 1024
+
+# Bump whenever a process_* method changes its output so stale cache entries are ignored
+PROCESSOR_VERSION = 1
+
+class FileAnswer:
+    """An answer submitted as the base64 encoding of a local file
+    
+    temporary marks files we created (shrunk copies) that discard() removes.
+    """
+    
+    def __init__(self, filepath, temporary=False):
+        self.filepath = Path(filepath)
+        self.temporary = temporary
+    
+    @property
+    def encoded_size(self):
+        """Length of the encoded answer without reading the file"""
+        return 4 * -(-self.filepath.stat().st_size // 3)
+    
+    def discard(self):
+        """Remove the file if it is a temporary copy"""
+        if self.temporary:
+            try:
+                os.remove(self.filepath)
+            except FileNotFoundError:
+                pass
+    
+    def __str__(self):
+        return f'<file {self.filepath}: {self.encoded_size} base64 chars>'
+
 class DataProcessor:
     """Handle data downloading and processing"""
     
-    def __init__(self, config):
+    def __init__(self, config, shared_state=None):
         self.config = config
         self.download_folder = Path(config.DOWNLOAD_FOLDER)
         self.download_folder.mkdir(exist_ok=True)
+        self.shared_state = shared_state or SharedState(config)
+        self.http = get_http_client(config)
+        self.file_cache = FileCache(config, PROCESSOR_VERSION, self.shared_state)
     
-    def download_file(self, url):
+    def download_file(self, url, deadline=None):
         """Download a file from URL"""
         try:
             logger.info(f'Downloading file from: {url}')
             
-            response = requests.get(url, timeout=30)
+            response = self.http.get(url, deadline=deadline)
             response.raise_for_status()
             
             # Extract filename from URL
@@ -44,9 +87,29 @@ class DataProcessor:
             return None
     
     def process_file(self, filepath):
-        """Process a file based on its type"""
+        """Process a file, reusing a cached result when the content is unchanged"""
         try:
             filepath = Path(filepath)
+            
+            if not self.file_cache.enabled:
+                return self._process_by_type(filepath)
+            
+            cache_key = self.file_cache.make_key(filepath)
+            data = self.file_cache.get(cache_key, source_size=filepath.stat().st_size)
+            if data is not None:
+                return data
+            
+            data = self._process_by_type(filepath)
+            self.file_cache.put(cache_key, data)
+            return data
+            
+        except Exception as e:
+            logger.error(f'Error processing file: {str(e)}')
+            return None
+    
+    def _process_by_type(self, filepath):
+        """Process a file based on its type"""
+        try:
             extension = filepath.suffix.lower()
             
             logger.info(f'Processing file: {filepath} (type: {extension})')
@@ -195,11 +258,67 @@ class DataProcessor:
     def encode_file_to_base64(self, filepath):
         """Encode a file to base64 for submission"""
         try:
-            with open(filepath, 'rb') as f:
-                encoded = base64.b64encode(f.read()).decode('utf-8')
-            
-            return encoded
+            return b''.join(self.iter_base64(filepath)).decode('ascii')
             
         except Exception as e:
             logger.error(f'Error encoding file: {str(e)}')
+            return None
+    
+    def iter_base64(self, filepath):
+        """Yield the base64 encoding of a file chunk by chunk"""
+        with open(filepath, 'rb') as f:
+            for chunk in iter(lambda: f.read(BASE64_CHUNK_SIZE), b''):
+                yield base64.b64encode(chunk)
+    
+    def shrink_file_answer(self, file_answer, max_chars):
+        """Re-encode an image answer until its base64 fits in max_chars
+        
+        Returns a new temporary FileAnswer, or None if the file is not an
+        image or Pillow is not installed.
+        """
+        if Image is None:
+            logger.warning('Pillow is not installed; cannot shrink file answer')
+            return None
+        
+        shrunk = None
+        try:
+            temp_folder = Path(self.config.TEMP_FOLDER)
+            temp_folder.mkdir(exist_ok=True)
+            
+            with Image.open(file_answer.filepath) as original:
+                image = original.copy()
+            image_format = 'PNG' if file_answer.filepath.suffix.lower() == '.png' else 'JPEG'
+            if image_format == 'JPEG':
+                image = image.convert('RGB')
+            
+            # TEMP_FOLDER is shared by all workers, so each shrink gets its own file
+            fd, shrunk_path = tempfile.mkstemp(dir=temp_folder, prefix='shrunk_', suffix=f'.{image_format.lower()}')
+            os.close(fd)
+            shrunk = FileAnswer(shrunk_path, temporary=True)
+            quality = 85
+            
+            for _ in range(8):
+                if image_format == 'PNG':
+                    image.save(shrunk_path, 'PNG', optimize=True)
+                else:
+                    image.save(shrunk_path, 'JPEG', quality=quality, optimize=True)
+                
+                if shrunk.encoded_size <= max_chars:
+                    logger.info(f'Shrunk file answer to {shrunk.encoded_size} base64 chars')
+                    return shrunk
+                
+                # Lower quality first, then resolution
+                if image_format == 'JPEG' and quality > 50:
+                    quality -= 15
+                else:
+                    image = image.resize((max(1, image.width * 3 // 4), max(1, image.height * 3 // 4)))
+            
+            logger.error('Could not shrink file answer below the payload limit')
+            shrunk.discard()
+            return None
+            
+        except Exception as e:
+            logger.error(f'Error shrinking file answer: {str(e)}')
+            if shrunk:
+                shrunk.discard()
             return None
\ No newline at end of file
@@ -0,0 +1,127 @@
+import logging
+import os
+import pickle
+import hashlib
+import tempfile
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+class FileCache:
+    """Persistent pickle store of processed file results keyed by content hash
+    
+    Entries are unpickled on read, so the cache folder must only be writable
+    by the user running the workers.
+    """
+    
+    ENTRY_SUFFIX = '.pkl'
+    NAMESPACE = 'file_cache'
+    
+    def __init__(self, config, version, shared_state):
+        self.config = config
+        self.version = version
+        self.shared_state = shared_state
+        self.enabled = config.FILE_CACHE_ENABLED
+        self.max_bytes = config.FILE_CACHE_MAX_BYTES
+        self.cache_folder = Path(config.FILE_CACHE_FOLDER)
+        self.cache_folder.mkdir(mode=0o700, exist_ok=True)
+    
+    @staticmethod
+    def hash_file(filepath, chunk_size=1024 * 1024):
+        """Compute the sha256 of a file without loading it into memory"""
+        digest = hashlib.sha256()
+        with open(filepath, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+    
+    def make_key(self, filepath):
+        """Build the cache key from file content, extension and processor version
+        
+        The extension is part of the key because it selects the processor, so the
+        same bytes saved as .txt and .csv produce different results.
+        """
+        extension = Path(filepath).suffix.lower().lstrip('.') or 'none'
+        return f'{self.hash_file(filepath)}-{extension}-v{self.version}'
+    
+    def _entry_path(self, key):
+        return self.cache_folder / f'{key}{self.ENTRY_SUFFIX}'
+    
+    def get(self, key, source_size=0):
+        """Return the cached result for a key, or None on a miss"""
+        if not self.enabled:
+            return None
+        
+        entry_path = self._entry_path(key)
+        try:
+            with open(entry_path, 'rb') as f:
+                data = pickle.load(f)
+            
+            # Mark the entry as recently used for eviction in every worker
+            self.shared_state.cache_get(self.NAMESPACE, key)
+            
+            self.shared_state.incr(f'{self.NAMESPACE}.hits')
+            self.shared_state.incr(f'{self.NAMESPACE}.bytes_saved', source_size)
+            logger.info(f'File cache hit: {key}')
+            return data
+        
+        except FileNotFoundError:
+            self.shared_state.incr(f'{self.NAMESPACE}.misses')
+            return None
+        except Exception as e:
+            logger.warning(f'Discarding unreadable cache entry {key}: {str(e)}')
+            self._remove(entry_path)
+            self.shared_state.cache_delete(self.NAMESPACE, key)
+            self.shared_state.incr(f'{self.NAMESPACE}.misses')
+            return None
+    
+    def put(self, key, data):
+        """Store a processed result under a key"""
+        if not self.enabled or data is None:
+            return
+        
+        tmp_path = None
+        try:
+            # Write to a temp file and rename so other workers never see a partial entry
+            entry_path = self._entry_path(key)
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_folder, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, entry_path)
+            tmp_path = None
+            
+            self.shared_state.cache_put(self.NAMESPACE, key, entry_path.name, size=entry_path.stat().st_size)
+            
+            logger.info(f'File cache stored: {key}')
+            self.evict()
+        
+        except Exception as e:
+            logger.error(f'Error writing cache entry: {str(e)}')
+            # Eviction only walks the shared index, so an orphaned temp file would never be removed
+            if tmp_path:
+                self._remove(tmp_path)
+    
+    def evict(self):
+        """Remove least recently used entries until the cache fits its size bound"""
+        for _, filename in self.shared_state.cache_evict(self.NAMESPACE, self.max_bytes):
+            self._remove(self.cache_folder / filename)
+            logger.info(f'File cache evicted: {filename}')
+    
+    def _remove(self, entry_path):
+        try:
+            os.remove(entry_path)
+        except FileNotFoundError:
+            # Another worker already evicted it
+            pass
+    
+    def get_stats(self):
+        """Return hit rate and bytes saved across all workers"""
+        counters = self.shared_state.get_counters(f'{self.NAMESPACE}.')
+        hits = int(counters.get('hits', 0))
+        misses = int(counters.get('misses', 0))
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': hits / (hits + misses) if hits + misses else 0.0,
+            'bytes_saved': int(counters.get('bytes_saved', 0))
+        }
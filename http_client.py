@@ -0,0 +1,169 @@
+import logging
+import time
+import random
+import threading
+import requests
+from urllib.parse import urlsplit
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+IDEMPOTENT_METHODS = {'GET', 'HEAD', 'OPTIONS'}
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_http_client(config):
+    """Return the process-wide pooled HTTP client"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = HttpClient(config)
+        return _client
+
+class HttpClient:
+    """Shared requests session with per-host keep-alive pools, retries and warmup"""
+    
+    def __init__(self, config):
+        self.config = config
+        self.session = requests.Session()
+        self.adapter = HTTPAdapter(
+            pool_connections=config.HTTP_POOL_HOSTS,
+            pool_maxsize=config.HTTP_POOL_SIZE
+        )
+        self.session.mount('http://', self.adapter)
+        self.session.mount('https://', self.adapter)
+        
+        self.warming_hosts = set()
+        self.stats_lock = threading.Lock()
+        self.stats = {
+            'requests': 0,
+            'retries': 0,
+            'warmups': 0,
+            'handshake_time': 0.0
+        }
+    
+    def _incr(self, name, amount=1):
+        with self.stats_lock:
+            self.stats[name] += amount
+    
+    @staticmethod
+    def _failed_before_send(error):
+        """Whether a request failed while connecting, so the server never saw it"""
+        if isinstance(error, requests.ConnectTimeout):
+            return True
+        reason = getattr(error.args[0], 'reason', None) if error.args else None
+        return isinstance(reason, NewConnectionError)
+    
+    def request(self, method, url, deadline=None, data=None, idempotent=None, **kwargs):
+        """Send a request, retrying transient failures with jittered backoff before the deadline
+        
+        Idempotent requests (GET by default) are retried on connection errors,
+        timeouts, 429 and 5xx. Others, like quiz submissions, are only retried
+        when the connection could not be opened, since the server may already
+        have processed a request that timed out or failed afterwards.
+        
+        data may be a zero-argument callable returning a chunk generator; it is
+        called once per attempt so retries resend the full streamed body.
+        """
+        if idempotent is None:
+            idempotent = method.upper() in IDEMPOTENT_METHODS
+        attempt = 0
+        
+        while True:
+            timeout = self.config.HTTP_TIMEOUT
+            if deadline:
+                timeout = max(0.1, min(timeout, deadline - time.time()))
+            
+            self._incr('requests')
+            try:
+                body = data() if callable(data) else data
+                response = self.session.request(method, url, timeout=timeout, data=body, **kwargs)
+                if not idempotent or response.status_code not in RETRY_STATUS_CODES:
+                    return response
+                error = f'HTTP {response.status_code}'
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if not idempotent and not self._failed_before_send(e):
+                    raise
+                response = None
+                error = str(e)
+            
+            attempt += 1
+            backoff = min(self.config.HTTP_BACKOFF_MAX, self.config.HTTP_BACKOFF_BASE * 2 ** (attempt - 1))
+            backoff *= random.uniform(0.5, 1.0)
+            
+            out_of_time = deadline and time.time() + backoff >= deadline
+            if attempt > self.config.HTTP_MAX_RETRIES or out_of_time:
+                if response is not None:
+                    return response
+                raise requests.ConnectionError(f'{method} {url} failed after {attempt} attempts: {error}')
+            
+            if response is not None:
+                # Release the pooled connection now rather than when the response is garbage collected
+                response.close()
+            
+            logger.warning(f'{method} {url} failed ({error}), retrying in {backoff:.2f}s')
+            self._incr('retries')
+            time.sleep(backoff)
+    
+    def get(self, url, deadline=None, **kwargs):
+        return self.request('GET', url, deadline=deadline, **kwargs)
+    
+    def post(self, url, deadline=None, **kwargs):
+        return self.request('POST', url, deadline=deadline, **kwargs)
+    
+    def warmup(self, url):
+        """Open a pooled connection to the URL's host in the background"""
+        parts = urlsplit(url or '')
+        if parts.scheme not in ('http', 'https') or not parts.netloc:
+            return
+        
+        host = f'{parts.scheme}://{parts.netloc}'
+        
+        # Skip hosts that already have a warmup in flight; idle pooled connections are reused as-is
+        with self.stats_lock:
+            if host in self.warming_hosts:
+                return
+            self.warming_hosts.add(host)
+        
+        threading.Thread(target=self._connect, args=(host,), daemon=True).start()
+    
+    def _connect(self, host):
+        try:
+            pool = self.adapter.poolmanager.connection_from_url(host)
+            conn = pool._get_conn()
+            try:
+                if getattr(conn, 'sock', None) is None:
+                    connect_start = time.perf_counter()
+                    conn.connect()
+                    self._incr('handshake_time', time.perf_counter() - connect_start)
+                    self._incr('warmups')
+                    logger.info(f'Pre-connected to {host}')
+            finally:
+                pool._put_conn(conn)
+        except Exception as e:
+            logger.warning(f'Could not pre-connect to {host}: {str(e)}')
+        finally:
+            with self.stats_lock:
+                self.warming_hosts.discard(host)
+    
+    def get_stats(self):
+        """Return request counts, connection reuse ratio and warmup handshake time"""
+        connections = 0
+        pool_requests = 0
+        pools = self.adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is not None:
+                connections += pool.num_connections
+                pool_requests += pool.num_requests
+        
+        with self.stats_lock:
+            stats = dict(self.stats)
+        
+        stats['connections_opened'] = connections
+        stats['reuse_ratio'] = max(0.0, 1 - connections / pool_requests) if pool_requests else 0.0
+        stats['avg_handshake_time'] = stats['handshake_time'] / stats['warmups'] if stats['warmups'] else 0.0
+        return stats
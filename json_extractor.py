@@ -0,0 +1,123 @@
+import json
+import re
+
+# Straight-quote replacements for characters LLMs like to emit around keys/values
+SMART_QUOTES = {
+    '“': '"',
+    '”': '"',
+    '‘': "'",
+    '’': "'"
+}
+
+TRAILING_COMMA = re.compile(r',(\s*[}\]])')
+
+def find_json_objects(text):
+    """Yield top-level {...} substrings using a single linear scan
+    
+    Braces inside JSON strings are ignored. If the text ends while an object
+    is still open, the unterminated tail is yielded last so it can be repaired.
+    """
+    depth = 0
+    start = None
+    in_string = False
+    escaped = False
+    
+    for i, char in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == '\\':
+                escaped = True
+            elif char == '"':
+                in_string = False
+            continue
+        
+        if char == '"' and depth > 0:
+            in_string = True
+        elif char == '{':
+            if depth == 0:
+                start = i
+            depth += 1
+        elif char == '}' and depth > 0:
+            depth -= 1
+            if depth == 0:
+                yield text[start:i + 1]
+                start = None
+    
+    if start is not None:
+        yield text[start:]
+
+def repair_json(text):
+    """Apply cheap fixes for common LLM JSON mistakes"""
+    for smart, plain in SMART_QUOTES.items():
+        text = text.replace(smart, plain)
+    
+    text = TRAILING_COMMA.sub(r'\1', text)
+    
+    # Close an unterminated string and any brackets left open by a truncated reply
+    closers = []
+    in_string = False
+    escaped = False
+    for char in text:
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == '\\':
+                escaped = True
+            elif char == '"':
+                in_string = False
+            continue
+        
+        if char == '"':
+            in_string = True
+        elif char == '{':
+            closers.append('}')
+        elif char == '[':
+            closers.append(']')
+        elif char in '}]' and closers:
+            closers.pop()
+    
+    if in_string:
+        text += '"'
+    text = text.rstrip().rstrip(',')
+    return text + ''.join(reversed(closers))
+
+def matches_schema(data, required_keys=None):
+    """Check that parsed data is an object containing the required keys"""
+    if not isinstance(data, dict):
+        return False
+    return all(key in data for key in (required_keys or []))
+
+def _try_load(text, required_keys):
+    try:
+        data = json.loads(text)
+    except (ValueError, RecursionError):
+        return None
+    return data if matches_schema(data, required_keys) else None
+
+def extract_json(text, required_keys=None):
+    """Extract a JSON object from LLM output
+    
+    Returns a (data, method) tuple where method is 'direct', 'scan' or
+    'repair', or (None, None) if no candidate matched the schema.
+    """
+    if not text:
+        return None, None
+    
+    stripped = text.strip()
+    data = _try_load(stripped, required_keys)
+    if data is not None:
+        return data, 'direct'
+    
+    candidates = list(find_json_objects(stripped))
+    for candidate in candidates:
+        data = _try_load(candidate, required_keys)
+        if data is not None:
+            return data, 'scan'
+    
+    for candidate in candidates:
+        data = _try_load(repair_json(candidate), required_keys)
+        if data is not None:
+            return data, 'repair'
+    
+    return None, None
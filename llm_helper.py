@@ -1,21 +1,52 @@
 import logging
-from openai import OpenAI
+from openai import OpenAI, BadRequestError, UnprocessableEntityError
 import json
+import time
+import hashlib
+import threading
+from concurrent.futures import Future, wait, FIRST_COMPLETED
+from json_extractor import extract_json
+from shared_state import SharedState
 
 logger = logging.getLogger(__name__)
 
+# Upper edges in seconds of the per-endpoint latency histogram buckets
+LATENCY_BUCKETS = [0.5, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89, 144]
+
 class LLMHelper:
     """Helper class for LLM interactions"""
     
-    def __init__(self, config):
+    CACHE_NAMESPACE = 'llm'
+    
+    def __init__(self, config, shared_state=None):
         self.config = config
+        self.shared_state = shared_state or SharedState(config)
         self.client = OpenAI(
             api_key=config.OPENAI_API_KEY,
             base_url=getattr(config, 'OPENAI_BASE_URL', None)
         )
         self.model = config.OPENAI_MODEL
+        json_mode = getattr(config, 'OPENAI_JSON_MODE', True)
+        self.cache_enabled = getattr(config, 'LLM_CACHE_ENABLED', False)
+        # Set by QuizSolver for each chain; bounds request timeouts and the hedge delay
+        self.deadline = None
+        
+        # json_mode is switched off per endpoint if that endpoint rejects response_format
+        self.primary = {'name': 'primary', 'client': self.client, 'model': self.model, 'json_mode': json_mode}
+        self.secondary = None
+        
+        if getattr(config, 'LLM_HEDGE_ENABLED', False):
+            self.secondary = {
+                'name': 'secondary',
+                'client': OpenAI(
+                    api_key=config.LLM_HEDGE_API_KEY or config.OPENAI_API_KEY,
+                    base_url=config.LLM_HEDGE_BASE_URL or getattr(config, 'OPENAI_BASE_URL', None)
+                ),
+                'model': config.LLM_HEDGE_MODEL or self.model,
+                'json_mode': json_mode
+            }
     
-    def get_completion(self, prompt, system_message=None, temperature=0.1):
+    def get_completion(self, prompt, system_message=None, temperature=0.1, json_mode=False):
         """Get completion from OpenAI"""
         try:
             messages = []
@@ -38,30 +69,232 @@ class LLMHelper:
             
             logger.info(f'Requesting completion from {self.model}')
             
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=messages,
-                temperature=temperature,
-                max_tokens=2000
-            )
+            request_args = {
+                'model': self.model,
+                'messages': messages,
+                'temperature': temperature,
+                'max_tokens': 2000
+            }
+            
+            cache_key = None
+            if self.cache_enabled:
+                key_args = dict(request_args, json_mode=json_mode)
+                cache_key = hashlib.sha256(json.dumps(key_args, sort_keys=True).encode('utf-8')).hexdigest()
+                cached = self.shared_state.cache_get(self.CACHE_NAMESPACE, cache_key)
+                if cached is not None and time.time() - cached['created_at'] < self.config.LLM_CACHE_TTL:
+                    self.shared_state.incr('llm.cache_hits')
+                    logger.info(f'Using cached completion: {len(cached["content"])} characters')
+                    return cached['content']
+                self.shared_state.incr('llm.cache_misses')
+            
+            if self.secondary:
+                response = self._request_hedged(request_args, json_mode)
+            else:
+                response = self._request(self.primary, request_args, json_mode)
             
             content = response.choices[0].message.content
             logger.info(f'Received completion: {len(content)} characters')
             
-            return content
+            if cache_key:
+                self.shared_state.cache_put(
+                    self.CACHE_NAMESPACE,
+                    cache_key,
+                    {'content': content, 'created_at': time.time()},
+                    size=len(content)
+                )
+                self.shared_state.cache_evict(self.CACHE_NAMESPACE, self.config.LLM_CACHE_MAX_BYTES)
             
+            return content
+        
         except Exception as e:
             logger.error(f'Error getting LLM completion: {str(e)}')
             return None
     
-    def extract_json_from_text(self, text):
-        """Extract JSON object from text"""
+    def _request_timeout(self):
+        """Seconds a single request may take: OPENAI_TIMEOUT, but never past the deadline"""
+        timeout = getattr(self.config, 'OPENAI_TIMEOUT', 60)
+        if self.deadline:
+            timeout = max(1.0, min(timeout, self.deadline - time.time()))
+        return timeout
+    
+    def _request(self, endpoint, request_args, json_mode=False):
+        """Send a completion request to one endpoint and record its latency"""
+        request_args = dict(request_args, model=endpoint['model'])
+        if json_mode and endpoint['json_mode']:
+            request_args['response_format'] = {'type': 'json_object'}
+        request_start = time.time()
+        
         try:
-            import re
-            json_match = re.search(r'\{[^{}]*(?:\{[^{}]*\}[^{}]*)*\}', text, re.DOTALL)
-            if json_match:
-                return json.loads(json_match.group())
+            response = endpoint['client'].chat.completions.create(timeout=self._request_timeout(), **request_args)
+        except (BadRequestError, UnprocessableEntityError) as e:
+            if 'response_format' not in request_args or 'response_format' not in str(e):
+                raise
+            # Endpoint rejected the JSON mode parameter; remember that and fall back to plain text
+            logger.warning(f'JSON mode rejected by {endpoint["name"]} endpoint, disabling it: {str(e)}')
+            endpoint['json_mode'] = False
+            del request_args['response_format']
+            response = endpoint['client'].chat.completions.create(timeout=self._request_timeout(), **request_args)
+        
+        if not response.choices or not response.choices[0].message.content:
+            raise ValueError(f'Empty completion from {endpoint["name"]} endpoint')
+        
+        # Only successes go in the histogram; a failed primary is hedged immediately anyway
+        self._record_latency(endpoint['name'], time.time() - request_start)
+        return response
+    
+    def _latency_window(self):
+        return int(time.time() // self.config.LLM_HEDGE_WINDOW)
+    
+    def _record_latency(self, endpoint_name, latency):
+        """Count a request in the current window of the endpoint's latency histogram"""
+        bucket = next((edge for edge in LATENCY_BUCKETS if latency <= edge), 'inf')
+        self.shared_state.incr(f'llm_latency.{endpoint_name}.{self._latency_window()}.{bucket}')
+    
+    def _hedge_delay(self, endpoint_name):
+        """Latency percentile of an endpoint over the current and previous histogram windows
+        
+        Capped at LLM_HEDGE_DEFAULT_DELAY and at half the time left before the
+        deadline, so a slowing endpoint is hedged sooner rather than later.
+        """
+        prefix = f'llm_latency.{endpoint_name}.'
+        current = self._latency_window()
+        counts = {}
+        
+        for name, value in self.shared_state.get_counters(prefix).items():
+            window, _, bucket = name.partition('.')
+            if not window.isdigit():
+                continue
+            if int(window) < current - 1:
+                self.shared_state.delete_counters(f'{prefix}{window}.')
+            else:
+                counts[bucket] = counts.get(bucket, 0) + value
+        
+        max_delay = self.config.LLM_HEDGE_DEFAULT_DELAY
+        if self.deadline:
+            max_delay = max(0.0, min(max_delay, (self.deadline - time.time()) / 2))
+        
+        total = sum(counts.values())
+        if total < self.config.LLM_HEDGE_MIN_SAMPLES:
+            return max_delay
+        
+        target = self.config.LLM_HEDGE_PERCENTILE * total
+        seen = 0
+        for edge in LATENCY_BUCKETS:
+            seen += counts.get(str(edge), 0)
+            if seen >= target:
+                return min(edge, max_delay)
+        return max_delay
+    
+    def _start_request(self, endpoint, request_args, json_mode):
+        """Run a request on its own daemon thread and return its Future
+        
+        A thread per request means abandoned requests, which run until they
+        finish or time out, can never hold up new ones.
+        """
+        future = Future()
+        future.set_running_or_notify_cancel()
+        
+        def run():
+            try:
+                future.set_result(self._request(endpoint, request_args, json_mode))
+            except Exception as e:
+                future.set_exception(e)
+        
+        threading.Thread(target=run, name=f'llm-{endpoint["name"]}', daemon=True).start()
+        return future
+    
+    def _request_hedged(self, request_args, json_mode=False):
+        """Send to the primary endpoint, hedging to the secondary if it is slow or fails
+        
+        The first valid response wins. The loser finishes or times out in the
+        background and its tokens are counted as hedge cost.
+        """
+        primary = self._start_request(self.primary, request_args, json_mode)
+        delay = self._hedge_delay(self.primary['name'])
+        
+        done, _ = wait([primary], timeout=delay)
+        if primary in done and primary.exception() is None:
+            return primary.result()
+        
+        logger.info('Hedging to %s: primary %s', self.secondary['model'],
+                    'failed' if primary in done else f'slower than {delay}s')
+        self.shared_state.incr('llm_hedge.fired')
+        secondary = self._start_request(self.secondary, request_args, json_mode)
+        
+        winner = None
+        pending = {primary, secondary}
+        while pending and winner is None:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            winner = next((future for future in done if future.exception() is None), None)
+        
+        for future in (primary, secondary):
+            if future is not winner:
+                future.add_done_callback(self._record_hedge_cost)
+        
+        if winner is None:
+            raise primary.exception()
+        
+        if winner is secondary:
+            self.shared_state.incr('llm_hedge.secondary_wins')
+        return winner.result()
+    
+    def _record_hedge_cost(self, future):
+        """Count the tokens spent on a losing hedged request"""
+        if future.exception() is not None:
+            return
+        
+        self.shared_state.incr('llm_hedge.wasted_requests')
+        usage = getattr(future.result(), 'usage', None)
+        if usage:
+            self.shared_state.incr('llm_hedge.extra_tokens', usage.total_tokens)
+    
+    def get_hedge_stats(self):
+        """Return hedge counts, extra tokens spent and the current hedge delay"""
+        stats = {'fired': 0, 'secondary_wins': 0, 'wasted_requests': 0, 'extra_tokens': 0}
+        stats.update({name: int(value) for name, value in self.shared_state.get_counters('llm_hedge.').items()})
+        stats['enabled'] = self.secondary is not None
+        stats['delay'] = self._hedge_delay(self.primary['name']) if self.secondary else None
+        return stats
+    
+    def get_json_completion(self, prompt, required_keys=None, system_message=None, temperature=0.1):
+        """Get a completion and parse it as a JSON object with the required keys
+        
+        Uses JSON mode where the endpoint supports it, then the balanced-brace
+        scanner and a repair pass, and only re-queries once if all of those fail.
+        """
+        self.shared_state.incr('llm_json.requests')
+        
+        response = self.get_completion(prompt, system_message, temperature, json_mode=True)
+        data, method = extract_json(response, required_keys)
+        
+        if data is None and response is not None:
+            self.shared_state.incr('llm_json.requeries')
+            logger.warning('Could not parse JSON from completion, re-querying')
+            retry_prompt = (f'{prompt}\n\nYour previous reply was not a valid JSON object. '
+                            f'Reply with ONLY a JSON object containing the keys: {", ".join(required_keys or [])}')
+            response = self.get_completion(retry_prompt, system_message, temperature, json_mode=True)
+            data, method = extract_json(response, required_keys)
+        
+        if data is None:
+            self.shared_state.incr('llm_json.failures')
+            logger.error('JSON parse failed')
             return None
+        
+        self.shared_state.incr(f'llm_json.{method}')
+        return data
+    
+    def get_json_stats(self):
+        """Return JSON parse outcome counts and the failure rate across all workers"""
+        stats = {'requests': 0, 'direct': 0, 'scan': 0, 'repair': 0, 'requeries': 0, 'failures': 0}
+        stats.update({name: int(value) for name, value in self.shared_state.get_counters('llm_json.').items()})
+        stats['failure_rate'] = stats['failures'] / stats['requests'] if stats['requests'] else 0.0
+        return stats
+    
+    def extract_json_from_text(self, text, required_keys=None):
+        """Extract JSON object from text"""
+        try:
+            data, _ = extract_json(text, required_keys)
+            return data
         except Exception as e:
             logger.error(f'Error extracting JSON: {str(e)}')
             return None
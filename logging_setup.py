@@ -0,0 +1,115 @@
+import logging
+import json
+import queue
+import atexit
+import random
+from logging.handlers import QueueHandler, QueueListener
+
+# Pass as extra= on verbose per-step logs so LOG_SAMPLE_RATE applies to them
+SAMPLED = {'sampled': True}
+
+# Attributes every LogRecord has; anything else came in through extra=
+STANDARD_ATTRS = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime', 'sampled'}
+
+def summarize(value, limit):
+    """Copy of value with long strings and bytes replaced by a size summary"""
+    if isinstance(value, (bytes, bytearray)):
+        return f'<{len(value)} bytes>'
+    if isinstance(value, str):
+        if len(value) <= limit:
+            return value
+        return f'{value[:limit]}... <{len(value)} chars>'
+    if isinstance(value, dict):
+        return {key: summarize(item, limit) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [summarize(item, limit) for item in value]
+    return value
+
+class Truncated:
+    """Log argument that is only summarized and formatted if the record is emitted"""
+    
+    def __init__(self, value, limit):
+        self.value = value
+        self.limit = limit
+    
+    def __str__(self):
+        summary = summarize(self.value, self.limit)
+        if isinstance(summary, str):
+            return summary
+        return json.dumps(summary, default=str)
+
+class SamplingFilter(logging.Filter):
+    """Keep only a fraction of records logged with extra=SAMPLED"""
+    
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+    
+    def filter(self, record):
+        if getattr(record, 'sampled', False):
+            return random.random() < self.rate
+        return True
+
+class JsonFormatter(logging.Formatter):
+    """Format records as one JSON object per line"""
+    
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage()
+        }
+        
+        for key, value in vars(record).items():
+            if key not in STANDARD_ATTRS:
+                entry[key] = value
+        
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        
+        return json.dumps(entry, default=str)
+
+class LazyQueueHandler(QueueHandler):
+    """Queue handler that leaves message formatting to the listener thread
+    
+    The stock QueueHandler formats every record on the calling thread so it
+    can be pickled; our queue is in-process, so the record is passed as is.
+    """
+    
+    def prepare(self, record):
+        return record
+
+_listener = None
+_max_field_chars = 500
+
+def truncate(value, limit=None):
+    """Wrap a log argument so large values are summarized lazily"""
+    return Truncated(value, limit or _max_field_chars)
+
+def setup_logging(config):
+    """Route all logging through a background queue listener"""
+    global _listener, _max_field_chars
+    
+    if _listener is not None:
+        return
+    
+    _max_field_chars = config.LOG_MAX_FIELD_CHARS
+    
+    stream_handler = logging.StreamHandler()
+    if config.LOG_FORMAT == 'json':
+        stream_handler.setFormatter(JsonFormatter())
+    else:
+        stream_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+    
+    log_queue = queue.SimpleQueue()
+    queue_handler = LazyQueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter(config.LOG_SAMPLE_RATE))
+    
+    root = logging.getLogger()
+    root.setLevel(config.LOG_LEVEL)
+    root.handlers = [queue_handler]
+    
+    _listener = QueueListener(log_queue, stream_handler)
+    _listener.start()
+    atexit.register(_listener.stop)
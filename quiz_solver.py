@@ -1,34 +1,82 @@
 import logging
 import time
-import requests
 import json
 import traceback
-from browser_handler import BrowserHandler
-from data_processor import DataProcessor
+from pathlib import Path
+from browser_handler import get_browser
+from data_processor import DataProcessor, FileAnswer
 from llm_helper import LLMHelper
+from shared_state import SharedState
+from trace_recorder import TraceRecorder, ReplayBrowser
+from http_client import get_http_client
+from logging_setup import truncate, SAMPLED
 
 logger = logging.getLogger(__name__)
 
 class QuizSolver:
     """Main class for solving quiz tasks"""
     
-    def __init__(self, config):
+    def __init__(self, config, shared_state=None):
         self.config = config
-        self.browser = BrowserHandler(config)
-        self.data_processor = DataProcessor(config)
-        self.llm = LLMHelper(config)
+        self.shared_state = shared_state or SharedState(config)
+        self.tracer = TraceRecorder(config)
+        self.browser = ReplayBrowser() if self.tracer.replaying else get_browser(config)
+        self.data_processor = DataProcessor(config, self.shared_state)
+        self.llm = LLMHelper(config, self.shared_state)
+        self.http = get_http_client(config)
         self.start_time = None
+        self.deadline = None
+        self._attach_tracer()
+    
+    def _attach_tracer(self):
+        """Route external calls through the tracer and profile our own stages"""
+        # The browser is shared across requests, so wrap its method here rather than patching it
+        self.get_page_content = self.tracer.wrap('page', self.browser.get_page_content)
+        self.data_processor.download_file = self.tracer.wrap_download(
+            self.data_processor.download_file,
+            self.data_processor.download_folder
+        )
+        self.llm.get_completion = self.tracer.wrap('llm', self.llm.get_completion)
+        
+        self.parse_quiz_content = self.tracer.profile('parse', self.parse_quiz_content)
+        self.solve_task = self.tracer.profile('solve', self.solve_task)
+        # Only the POST is replayed, so building and encoding the body still runs under the profiler
+        self._post_submission = self.tracer.wrap(
+            'submit',
+            self._post_submission,
+            key_func=lambda submit_url, body, size: [submit_url, size]
+        )
+        self.submit_answer = self.tracer.profile('submit', self.submit_answer)
+        
+    def _warmup(self, url):
+        """Pre-connect to a host, except in replays, which must not touch the network"""
+        if not self.tracer.replaying:
+            self.http.warmup(url)
+    
+    def solve_quiz_chain(self, url, email, secret, job_id=None):
+        """Solve a chain of quiz questions
         
-    def solve_quiz_chain(self, url, email, secret):
-        """Solve a chain of quiz questions"""
+        job_id is the id returned by SharedState.claim_job when the caller
+        claimed the job itself; otherwise a job is claimed here.
+        """
         self.start_time = time.time()
+        self.deadline = self.start_time + self.config.MAX_QUIZ_TIME
+        self.llm.deadline = self.deadline
+        if job_id is None:
+            job_id, _ = self.shared_state.claim_job(url, self.config.MAX_QUIZ_TIME, self.config.JOB_STALE_AFTER)
+        self._warmup(url)
+        browser_start = self.browser.snapshot_stats()
+        
+        if self.tracer.recording:
+            self.tracer.metadata = {'url': url, 'email': email}
         current_url = url
         attempt_count = 0
         max_attempts = 10  # Prevent infinite loops
         
         while current_url and attempt_count < max_attempts:
             attempt_count += 1
-            logger.info(f'Attempt {attempt_count}: Processing {current_url}')
+            logger.info('Attempt %d: Processing %s', attempt_count, current_url)
+            self.shared_state.update_job(job_id, 'running', {'attempts': attempt_count, 'current_url': current_url})
             
             try:
                 # Check if we're within time limit
@@ -42,6 +90,7 @@ class QuizSolver:
                 
                 if result and 'url' in result:
                     current_url = result['url']
+                    self._warmup(current_url)
                     logger.info(f'Moving to next quiz: {current_url}')
                 else:
                     logger.info('Quiz chain completed')
@@ -52,21 +101,55 @@ class QuizSolver:
                 logger.error(traceback.format_exc())
                 break
         
-        self.browser.close()
-        return {'completed': True, 'attempts': attempt_count}
+        browser_stats = self.browser.get_stats(since=browser_start)
+        self.shared_state.incr('browser.pages', browser_stats['pages'])
+        self.shared_state.incr('browser.bytes_transferred', browser_stats['bytes_transferred'])
+        
+        http_stats = self.http.get_stats()
+        logger.info(f'HTTP: {http_stats["requests"]} requests over {http_stats["connections_opened"]} connections '
+                    f'(reuse {http_stats["reuse_ratio"]:.0%}), avg warmup handshake {http_stats["avg_handshake_time"]:.3f}s')
+        
+        file_cache_stats = self.data_processor.file_cache.get_stats()
+        logger.info(f'File cache: {file_cache_stats["hits"]} hits, {file_cache_stats["misses"]} misses, '
+                    f'{file_cache_stats["bytes_saved"]} bytes saved')
+        
+        json_stats = self.llm.get_json_stats()
+        logger.info(f'LLM JSON parsing: {json_stats["failures"]}/{json_stats["requests"]} failed, '
+                    f'{json_stats["repair"]} repaired, {json_stats["requeries"]} re-queried')
+        
+        hedge_stats = self.llm.get_hedge_stats()
+        if hedge_stats['enabled']:
+            logger.info(f'LLM hedging: {hedge_stats["fired"]} hedged, {hedge_stats["secondary_wins"]} won by secondary, '
+                        f'{hedge_stats["extra_tokens"]} extra tokens')
+        
+        result = {
+            'job_id': job_id,
+            'completed': True,
+            'attempts': attempt_count,
+            'file_cache': file_cache_stats,
+            'llm_json': json_stats,
+            'browser': browser_stats,
+            'http': http_stats,
+            'llm_hedge': hedge_stats
+        }
+        self.tracer.save()
+        self.shared_state.update_job(job_id, 'completed', result)
+        self.shared_state.incr('jobs.completed')
+        
+        return result
     
     def solve_single_quiz(self, quiz_url, email, secret):
         """Solve a single quiz question"""
         try:
             # Step 1: Get the quiz content using browser
-            logger.info(f'Fetching quiz from: {quiz_url}')
-            quiz_content = self.browser.get_page_content(quiz_url)
+            logger.info('Fetching quiz from: %s', quiz_url)
+            quiz_content = self.get_page_content(quiz_url)
             
             if not quiz_content:
                 logger.error('Failed to fetch quiz content')
                 return None
             
-            logger.info(f'Quiz content retrieved: {quiz_content[:200]}...')
+            logger.info('Quiz content retrieved: %s', truncate(quiz_content, 200), extra=SAMPLED)
             
             # Step 2: Parse the quiz to extract task and submit URL
             task_info = self.parse_quiz_content(quiz_content)
@@ -75,8 +158,13 @@ class QuizSolver:
                 logger.error('Failed to parse quiz content')
                 return None
             
-            logger.info(f'Task: {task_info["task"]}')
-            logger.info(f'Submit URL: {task_info["submit_url"]}')
+            logger.info('Task: %s', truncate(task_info['task']), extra=SAMPLED)
+            logger.info('Submit URL: %s', task_info['submit_url'])
+            
+            # Hosts are known now; connect while the LLM works on the answer
+            self._warmup(task_info['submit_url'])
+            for file_url in task_info.get('file_urls', []):
+                self._warmup(file_url)
             
             # Step 3: Solve the task using LLM and data processing
             answer = self.solve_task(task_info)
@@ -85,7 +173,7 @@ class QuizSolver:
                 logger.error('Failed to generate answer')
                 return None
             
-            logger.info(f'Generated answer: {answer}')
+            logger.info('Generated answer: %s', truncate(answer))
             
             # Step 4: Submit the answer
             result = self.submit_answer(
@@ -124,13 +212,9 @@ Respond with a JSON object:
     "answer_format": "type of answer expected"
 }}"""
             
-            response = self.llm.get_completion(parse_prompt)
+            task_info = self.llm.get_json_completion(parse_prompt, required_keys=['task', 'submit_url'])
             
-            # Try to extract JSON from response
-            import re
-            json_match = re.search(r'\{[^{}]*(?:\{[^{}]*\}[^{}]*)*\}', response, re.DOTALL)
-            if json_match:
-                task_info = json.loads(json_match.group())
+            if task_info:
                 return task_info
             
             logger.error('Could not parse quiz structure')
@@ -150,7 +234,7 @@ Respond with a JSON object:
             # Download any required files
             downloaded_files = []
             for url in file_urls:
-                file_path = self.data_processor.download_file(url)
+                file_path = self.data_processor.download_file(url, deadline=self.deadline)
                 if file_path:
                     downloaded_files.append(file_path)
             
@@ -169,13 +253,17 @@ Task: {task}
 Available data:
 {json.dumps(processed_data, default=str, indent=2)}
 
+Downloaded files:
+{json.dumps(downloaded_files)}
+
 Provide the answer in this format: {answer_format}
+If the answer is the base64 encoding of one of the downloaded files, respond with that file's path instead.
 Respond with ONLY the answer value, nothing else."""
             
             answer = self.llm.get_completion(solve_prompt)
             
             # Convert answer to appropriate type
-            answer = self.convert_answer(answer, answer_format)
+            answer = self.convert_answer(answer, answer_format, downloaded_files)
             
             return answer
             
@@ -183,7 +271,7 @@ Respond with ONLY the answer value, nothing else."""
             logger.error(f'Error solving task: {str(e)}')
             return None
     
-    def convert_answer(self, answer, format_type):
+    def convert_answer(self, answer, format_type, downloaded_files=None):
         """Convert answer string to the appropriate type"""
         try:
             answer = answer.strip()
@@ -197,6 +285,12 @@ Respond with ONLY the answer value, nothing else."""
                     return float(answer)
             elif format_type == 'json':
                 return json.loads(answer)
+            elif 'base64' in str(format_type).lower():
+                file_path = self._match_downloaded_file(answer, downloaded_files or [])
+                if file_path:
+                    # Stream the file at submit time instead of holding its encoding in memory
+                    return FileAnswer(file_path)
+                return answer
             else:
                 return answer
                 
@@ -204,6 +298,55 @@ Respond with ONLY the answer value, nothing else."""
             logger.error(f'Error converting answer: {str(e)}')
             return answer
     
+    def _match_downloaded_file(self, answer, downloaded_files):
+        """Return the downloaded file a base64 answer names, or None
+        
+        The LLM is told which files were downloaded and answers with a path or
+        file name; any other answer is submitted as the LLM wrote it.
+        """
+        answer = answer.strip('\'"` ')
+        for file_path in downloaded_files:
+            if answer in (file_path, Path(file_path).name):
+                return file_path
+        return None
+    
+    def _build_submission_body(self, payload):
+        """Serialize a submission, streaming file answers instead of encoding them up front
+        
+        Returns (body, size) where body is bytes or a zero-argument callable
+        producing a fresh chunk generator for each send attempt, or
+        (None, size) if the answer cannot be brought under the payload limit.
+        A shrunk file answer replaces payload['answer'] so the caller can
+        remove it after sending.
+        """
+        answer = payload['answer']
+        limit = self.config.MAX_SUBMIT_BYTES
+        
+        if not isinstance(answer, FileAnswer):
+            body = json.dumps(payload).encode('utf-8')
+            return (body if len(body) <= limit else None), len(body)
+        
+        # Split the JSON around a placeholder so the encoded file goes between the halves
+        placeholder = '__FILE_ANSWER__'
+        prefix, suffix = json.dumps({**payload, 'answer': placeholder}).encode('utf-8').split(placeholder.encode('utf-8'))
+        overhead = len(prefix) + len(suffix)
+        
+        size = overhead + answer.encoded_size
+        if size > limit:
+            logger.warning('File answer is %d bytes, over the %d byte limit; shrinking', size, limit)
+            answer = self.data_processor.shrink_file_answer(answer, limit - overhead)
+            if answer is None:
+                return None, size
+            payload['answer'] = answer
+            size = overhead + answer.encoded_size
+        
+        def body():
+            yield prefix
+            yield from self.data_processor.iter_base64(answer.filepath)
+            yield suffix
+        
+        return body, size
+    
     def submit_answer(self, submit_url, email, secret, quiz_url, answer):
         """Submit the answer to the specified endpoint"""
         try:
@@ -214,26 +357,48 @@ Respond with ONLY the answer value, nothing else."""
                 'answer': answer
             }
             
-            logger.info(f'Submitting to: {submit_url}')
-            logger.info(f'Payload: {json.dumps(payload, indent=2)}')
+            logger.info('Submitting to: %s', submit_url)
+            logger.info('Payload: %s', truncate(payload), extra=SAMPLED)
             
-            response = requests.post(
-                submit_url,
-                json=payload,
-                headers={'Content-Type': 'application/json'},
-                timeout=30
-            )
+            body, size = self._build_submission_body(payload)
+            if body is None:
+                logger.error('Answer payload is %d bytes, over the %d byte limit; not submitting',
+                             size, self.config.MAX_SUBMIT_BYTES)
+                return None
+            
+            if self.tracer.replaying and callable(body):
+                # The POST is replayed, but stream the body anyway so its encoding is profiled
+                for _ in body():
+                    pass
             
-            logger.info(f'Response status: {response.status_code}')
+            status_code, text = self._post_submission(submit_url, body, size)
             
-            if response.status_code == 200:
-                result = response.json()
-                logger.info(f'Response: {json.dumps(result, indent=2)}')
+            logger.info('Response status: %d', status_code)
+            
+            if status_code == 200:
+                result = json.loads(text)
+                logger.info('Response: %s', truncate(result))
                 return result
             else:
-                logger.error(f'Failed to submit: {response.text}')
+                logger.error('Failed to submit: %s', truncate(text))
                 return None
                 
         except Exception as e:
             logger.error(f'Error submitting answer: {str(e)}')
-            return None
\ No newline at end of file
+            return None
+        finally:
+            if payload['answer'] is not answer:
+                payload['answer'].discard()
+    
+    def _post_submission(self, submit_url, body, size):
+        """POST a built submission body and return the status code and response text
+        
+        size is only used to identify the request in traces.
+        """
+        response = self.http.post(
+            submit_url,
+            deadline=self.deadline,
+            data=body,
+            headers={'Content-Type': 'application/json'}
+        )
+        return response.status_code, response.text
\ No newline at end of file
@@ -0,0 +1,228 @@
+import logging
+import os
+import json
+import time
+import uuid
+import sqlite3
+import threading
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    status TEXT NOT NULL,
+    result TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS cache_index (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL DEFAULT 0,
+    last_access REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+);
+CREATE INDEX IF NOT EXISTS jobs_url ON jobs (url, created_at);
+CREATE INDEX IF NOT EXISTS cache_index_lru ON cache_index (namespace, last_access);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value REAL NOT NULL DEFAULT 0
+);
+"""
+
+class SharedState:
+    """Cross-worker job records, cache indexes and counters in a local SQLite WAL database"""
+    
+    def __init__(self, config):
+        self.config = config
+        self.db_path = config.SHARED_STATE_PATH
+        self._local = threading.local()
+        
+        conn = self._connect()
+        conn.executescript(SCHEMA)
+        conn.close()
+    
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=self.config.SHARED_STATE_TIMEOUT,
+                               isolation_level=None, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute(f'PRAGMA busy_timeout={int(self.config.SHARED_STATE_TIMEOUT * 1000)}')
+        return conn
+    
+    @property
+    def conn(self):
+        """Connection for the current thread, reopened after a fork"""
+        if getattr(self._local, 'pid', None) != os.getpid():
+            self._local.conn = self._connect()
+            self._local.pid = os.getpid()
+        return self._local.conn
+    
+    # Jobs
+    
+    def claim_job(self, url, max_age, stale_after):
+        """Start a job for a URL unless one started within max_age seconds is still running
+        
+        A running job only counts if it was updated within stale_after seconds,
+        so a job left behind by a killed worker does not block retries.
+        Returns (job_id, created). When another worker already runs the URL,
+        its job id is returned with created=False.
+        """
+        conn = self.conn
+        now = time.time()
+        
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute(
+                "SELECT id FROM jobs WHERE url = ? AND status = 'running' AND created_at > ? AND updated_at > ? "
+                'ORDER BY created_at DESC LIMIT 1',
+                (url, now - max_age, now - stale_after)
+            ).fetchone()
+            
+            if row:
+                conn.execute('COMMIT')
+                return row[0], False
+            
+            job_id = uuid.uuid4().hex
+            conn.execute(
+                'INSERT INTO jobs (id, url, status, created_at, updated_at) VALUES (?, ?, ?, ?, ?)',
+                (job_id, url, 'running', now, now)
+            )
+            conn.execute('COMMIT')
+            return job_id, True
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+    
+    def update_job(self, job_id, status, result=None):
+        """Update a job's status and optional result"""
+        self.conn.execute(
+            'UPDATE jobs SET status = ?, result = ?, updated_at = ? WHERE id = ?',
+            (status, json.dumps(result, default=str) if result is not None else None, time.time(), job_id)
+        )
+    
+    def get_job(self, job_id):
+        """Return a job record as a dict, or None if unknown"""
+        row = self.conn.execute(
+            'SELECT id, url, status, result, created_at, updated_at FROM jobs WHERE id = ?',
+            (job_id,)
+        ).fetchone()
+        return self._job_from_row(row)
+    
+    def find_job(self, url):
+        """Return the most recent job for a URL, or None if there is none"""
+        row = self.conn.execute(
+            'SELECT id, url, status, result, created_at, updated_at FROM jobs WHERE url = ? '
+            'ORDER BY created_at DESC LIMIT 1',
+            (url,)
+        ).fetchone()
+        return self._job_from_row(row)
+    
+    def _job_from_row(self, row):
+        if not row:
+            return None
+        
+        return {
+            'id': row[0],
+            'url': row[1],
+            'status': row[2],
+            'result': json.loads(row[3]) if row[3] else None,
+            'created_at': row[4],
+            'updated_at': row[5]
+        }
+    
+    # Cache indexes
+    
+    def cache_get(self, namespace, key):
+        """Return a cached value and mark it as recently used, or None on a miss"""
+        conn = self.conn
+        row = conn.execute(
+            'SELECT value FROM cache_index WHERE namespace = ? AND key = ?',
+            (namespace, key)
+        ).fetchone()
+        
+        if not row:
+            return None
+        
+        conn.execute(
+            'UPDATE cache_index SET last_access = ? WHERE namespace = ? AND key = ?',
+            (time.time(), namespace, key)
+        )
+        return json.loads(row[0])
+    
+    def cache_put(self, namespace, key, value, size=0):
+        """Insert or replace a cached value"""
+        self.conn.execute(
+            'INSERT OR REPLACE INTO cache_index (namespace, key, value, size, last_access) VALUES (?, ?, ?, ?, ?)',
+            (namespace, key, json.dumps(value, default=str), size, time.time())
+        )
+    
+    def cache_delete(self, namespace, key):
+        """Remove a cached value"""
+        self.conn.execute(
+            'DELETE FROM cache_index WHERE namespace = ? AND key = ?',
+            (namespace, key)
+        )
+    
+    def cache_evict(self, namespace, max_bytes):
+        """Drop least recently used entries until the namespace fits in max_bytes
+        
+        Returns the (key, value) pairs removed so callers can clean up files.
+        """
+        conn = self.conn
+        evicted = []
+        
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            total_size = conn.execute(
+                'SELECT COALESCE(SUM(size), 0) FROM cache_index WHERE namespace = ?',
+                (namespace,)
+            ).fetchone()[0]
+            
+            if total_size > max_bytes:
+                rows = conn.execute(
+                    'SELECT key, value, size FROM cache_index WHERE namespace = ? ORDER BY last_access',
+                    (namespace,)
+                ).fetchall()
+                
+                for key, value, size in rows:
+                    if total_size <= max_bytes:
+                        break
+                    conn.execute(
+                        'DELETE FROM cache_index WHERE namespace = ? AND key = ?',
+                        (namespace, key)
+                    )
+                    evicted.append((key, json.loads(value)))
+                    total_size -= size
+            
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        
+        return evicted
+    
+    # Counters
+    
+    def incr(self, name, amount=1):
+        """Atomically add to a named counter"""
+        self.conn.execute(
+            'INSERT INTO counters (name, value) VALUES (?, ?) '
+            'ON CONFLICT(name) DO UPDATE SET value = value + excluded.value',
+            (name, amount)
+        )
+    
+    def delete_counters(self, prefix):
+        """Drop counters whose names start with prefix"""
+        self.conn.execute('DELETE FROM counters WHERE name LIKE ?', (prefix + '%',))
+    
+    def get_counters(self, prefix=''):
+        """Return counters whose names start with prefix, without the prefix"""
+        rows = self.conn.execute(
+            'SELECT name, value FROM counters WHERE name LIKE ?',
+            (prefix + '%',)
+        ).fetchall()
+        return {name[len(prefix):]: value for name, value in rows}
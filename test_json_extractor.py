@@ -0,0 +1,40 @@
+"""Tests for the LLM JSON extractor"""
+
+from json_extractor import extract_json, find_json_objects, repair_json
+
+def test_direct_json():
+    assert extract_json('{"task": "a", "submit_url": "b"}', ['task']) == ({'task': 'a', 'submit_url': 'b'}, 'direct')
+
+def test_nested_object_in_prose():
+    text = 'Here you go:\n```json\n{"task": "t", "meta": {"a": {"b": {"c": 1}}}}\n```'
+    data, method = extract_json(text, ['task'])
+    assert method == 'scan'
+    assert data['meta']['a']['b']['c'] == 1
+
+def test_braces_inside_strings():
+    text = 'x {"task": "use {braces} and \\"quotes\\" }", "n": 1} y'
+    assert list(find_json_objects(text)) == ['{"task": "use {braces} and \\"quotes\\" }", "n": 1}']
+    assert extract_json(text, ['task'])[0]['task'] == 'use {braces} and "quotes" }'
+
+def test_skips_candidates_missing_required_keys():
+    data, method = extract_json('{"a": 1} then {"task": 2}', ['task'])
+    assert data == {'task': 2}
+    assert method == 'scan'
+
+def test_truncated_reply_is_repaired():
+    data, method = extract_json('{"task": "a", "file_urls": ["u1", "u', ['task'])
+    assert method == 'repair'
+    assert data == {'task': 'a', 'file_urls': ['u1', 'u']}
+
+def test_trailing_comma_and_smart_quotes():
+    assert repair_json('{“task”: “a”,}') == '{"task": "a"}'
+    assert extract_json('{“task”: “a”, }', ['task']) == ({'task': 'a'}, 'repair')
+
+def test_no_json():
+    assert extract_json('no json here', ['task']) == (None, None)
+    assert extract_json(None) == (None, None)
+
+def test_deep_nesting_does_not_raise():
+    text = '[' * 100000 + ']' * 100000
+    assert extract_json(text) == (None, None)
+    assert extract_json('{"a": ' * 50000 + '1' + '}' * 50000) == (None, None)
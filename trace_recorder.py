@@ -0,0 +1,228 @@
+import logging
+import os
+import sys
+import json
+import time
+import pstats
+import hashlib
+import zipfile
+import cProfile
+import tempfile
+from pathlib import Path
+from collections import defaultdict, deque
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = 'manifest.json'
+
+class TraceRecorder:
+    """Record every external interaction of a quiz chain, or replay them offline"""
+    
+    def __init__(self, config):
+        self.config = config
+        self.mode = (config.TRACE_MODE or 'off').lower()
+        self.trace_path = Path(config.TRACE_PATH)
+        self.profile_dir = Path(config.TRACE_PROFILE_DIR) if config.TRACE_PROFILE_DIR else None
+        
+        self.metadata = {}
+        self.events = []
+        self.files = {}
+        self.profilers = {}
+        self.stage_times = defaultdict(float)
+        
+        # Replay lookups: exact (kind, key) matches first, then recorded order per kind
+        self._by_key = defaultdict(deque)
+        self._by_kind = defaultdict(deque)
+        
+        if self.mode == 'replay':
+            self._load()
+        elif self.mode not in ('off', 'record'):
+            raise ValueError(f'Unknown TRACE_MODE: {self.mode}')
+    
+    @property
+    def recording(self):
+        return self.mode == 'record'
+    
+    @property
+    def replaying(self):
+        return self.mode == 'replay'
+    
+    @staticmethod
+    def _request_key(args, kwargs):
+        payload = json.dumps([args, kwargs], default=str, sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+    
+    def _load(self):
+        """Load a trace archive for replay"""
+        with zipfile.ZipFile(self.trace_path) as archive:
+            manifest = json.loads(archive.read(MANIFEST_NAME))
+            for name in archive.namelist():
+                if name != MANIFEST_NAME:
+                    self.files[name] = archive.read(name)
+        
+        self.metadata = manifest['metadata']
+        for event in manifest['events']:
+            self._by_key[(event['kind'], event['key'])].append(event)
+            self._by_kind[event['kind']].append(event)
+        
+        logger.info(f'Loaded trace {self.trace_path}: {len(manifest["events"])} events')
+    
+    def _next_event(self, kind, key):
+        """Pop the recorded event for a request, falling back to recorded order"""
+        exact = self._by_key.get((kind, key))
+        event = exact.popleft() if exact else None
+        
+        if event is None:
+            if not self._by_kind[kind]:
+                raise LookupError(f'Trace has no more {kind} events')
+            logger.warning(f'No exact {kind} match in trace, using next recorded event')
+            event = self._by_kind[kind][0]
+            self._by_key[(kind, event['key'])].remove(event)
+        
+        self._by_kind[kind].remove(event)
+        return event
+    
+    def wrap(self, kind, func, key_func=None):
+        """Wrap a callable whose JSON-serializable result is recorded or replayed
+        
+        key_func maps the call arguments to the values that identify a request,
+        so arguments that differ between runs (like secrets) can be left out.
+        """
+        if self.mode == 'off':
+            return func
+        
+        def traced(*args, **kwargs):
+            if key_func:
+                key = self._request_key(key_func(*args, **kwargs), {})
+            else:
+                key = self._request_key(args, kwargs)
+            
+            if self.replaying:
+                return self._next_event(kind, key)['result']
+            
+            result = func(*args, **kwargs)
+            self.events.append({'kind': kind, 'key': key, 'result': result})
+            return result
+        
+        return traced
+    
+    def wrap_download(self, func, download_folder):
+        """Wrap a download function, storing file bytes in the archive"""
+        if self.mode == 'off':
+            return func
+        
+        download_folder = Path(download_folder)
+        
+        def traced(url, *args, **kwargs):
+            key = self._request_key([url], {})
+            
+            if self.replaying:
+                event = self._next_event('download', key)
+                if event['result'] is None:
+                    return None
+                filepath = download_folder / event['result']['filename']
+                with open(filepath, 'wb') as f:
+                    f.write(self.files[event['result']['archive_name']])
+                return str(filepath)
+            
+            filepath = func(url, *args, **kwargs)
+            result = None
+            if filepath:
+                archive_name = f'files/{len(self.events)}_{Path(filepath).name}'
+                with open(filepath, 'rb') as f:
+                    self.files[archive_name] = f.read()
+                result = {'filename': Path(filepath).name, 'archive_name': archive_name}
+            
+            self.events.append({'kind': 'download', 'key': key, 'result': result})
+            return filepath
+        
+        return traced
+    
+    def profile(self, stage, func):
+        """Wrap a stage of our own code with a per-stage cProfile profiler"""
+        if not self.profile_dir:
+            return func
+        
+        profiler = self.profilers.setdefault(stage, cProfile.Profile())
+        
+        def profiled(*args, **kwargs):
+            stage_start = time.perf_counter()
+            profiler.enable()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                profiler.disable()
+                self.stage_times[stage] += time.perf_counter() - stage_start
+        
+        return profiled
+    
+    def save(self):
+        """Write the recorded trace archive and any stage profiles"""
+        if self.recording:
+            manifest = {'metadata': self.metadata, 'events': self.events}
+            with zipfile.ZipFile(self.trace_path, 'w', zipfile.ZIP_DEFLATED) as archive:
+                archive.writestr(MANIFEST_NAME, json.dumps(manifest, default=str))
+                for name, data in self.files.items():
+                    archive.writestr(name, data)
+            logger.info(f'Saved trace {self.trace_path}: {len(self.events)} events')
+        
+        if self.profile_dir:
+            self.profile_dir.mkdir(parents=True, exist_ok=True)
+            for stage, profiler in self.profilers.items():
+                profiler.dump_stats(str(self.profile_dir / f'{stage}.prof'))
+                logger.info(f'Stage {stage}: {self.stage_times[stage]:.3f}s')
+
+class ReplayBrowser:
+    """Stand-in for BrowserHandler when pages come from a trace"""
+    
+    def get_page_content(self, url):
+        raise LookupError('Page was not recorded in the trace')
+    
+    def snapshot_stats(self):
+        return {}
+    
+    def get_stats(self, since=None):
+        return {'lean_mode': None, 'pages': 0, 'bytes_transferred': 0, 'avg_render_time': 0.0,
+                'avg_dom_content_loaded_ms': None}
+    
+    def close(self):
+        pass
+
+def replay(trace_path, profile_dir=None):
+    """Run a recorded quiz chain offline and print per-stage profiles"""
+    from config import Config
+    from quiz_solver import QuizSolver
+    
+    # Keep replays out of the live state database, and measure parsing instead of cache hits
+    state_dir = tempfile.mkdtemp(prefix='quiz-replay-')
+    
+    class ReplayConfig(Config):
+        TRACE_MODE = 'replay'
+        TRACE_PATH = trace_path
+        TRACE_PROFILE_DIR = profile_dir
+        FILE_CACHE_ENABLED = False
+        LLM_CACHE_ENABLED = False
+        SHARED_STATE_PATH = os.path.join(state_dir, 'state.db')
+        FILE_CACHE_FOLDER = os.path.join(state_dir, 'cache')
+    
+    solver = QuizSolver(ReplayConfig)
+    metadata = solver.tracer.metadata
+    
+    start = time.perf_counter()
+    result = solver.solve_quiz_chain(metadata['url'], metadata['email'], 'replay-secret')
+    print(f'Replayed {result["attempts"]} quiz steps in {time.perf_counter() - start:.3f}s')
+    
+    if profile_dir:
+        for stage in solver.tracer.profilers:
+            print(f'\n=== {stage} ===')
+            pstats.Stats(os.path.join(profile_dir, f'{stage}.prof')).sort_stats('cumulative').print_stats(15)
+    
+    return result
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print('Usage: python trace_recorder.py <trace.zip> [profile_dir]')
+        sys.exit(1)
+    
+    logging.basicConfig(level=logging.WARNING)
+    replay(sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else None)